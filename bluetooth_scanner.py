@@ -16,48 +16,137 @@ except ImportError:
     print("Install it with: pip install bleak")
     exit(1)
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Fall back to stdlib json
+
 
 OUTPUT_FILE = "bluetooth_devices.json"
-SCAN_INTERVAL = 5  # seconds between scans
+SCAN_INTERVAL = 5  # seconds per scan window (changes are saved after each)
+CHECKPOINT_EVERY = 12  # scan windows between full snapshots (~1 minute)
 
 
 def load_existing_devices(filepath: Path) -> dict:
-    """Load existing devices from file if it exists."""
+    """Load existing devices from file, replaying any un-checkpointed log."""
+    devices = {}
     if filepath.exists():
         try:
-            with open(filepath, "r") as f:
-                return json.load(f)
+            with open(filepath, "rb") as f:
+                devices = json.load(f)
         except (json.JSONDecodeError, IOError):
-            return {}
-    return {}
+            devices = {}
+
+    log_path = filepath.with_suffix(".jsonl")
+    if log_path.exists():
+        try:
+            with open(log_path, "r") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn write from an interrupted scan
+                    devices[row["address"]] = row
+        except IOError:
+            pass
+    return devices
 
 
 def save_devices(filepath: Path, devices: dict):
     """Save devices to JSON file."""
-    with open(filepath, "w") as f:
-        json.dump(devices, f, indent=2, default=str)
+    if orjson is not None:
+        data = orjson.dumps(devices, option=orjson.OPT_INDENT_2, default=str)
+    else:
+        data = json.dumps(devices, indent=2, default=str).encode()
+    with open(filepath, "wb") as f:
+        f.write(data)
 
 
-async def scan_bluetooth():
-    """Perform a single Bluetooth scan and return discovered devices."""
-    devices = await BleakScanner.discover(timeout=4.0)
-    return devices
+def append_devices(log, rows: list):
+    """Append new/updated device rows to the JSONL log."""
+    for row in rows:
+        log.write(json.dumps(row, separators=(",", ":"), default=str) + "\n")
+    log.flush()
+
+
+def checkpoint(filepath: Path, log, devices: dict):
+    """Write a full JSON snapshot and reset the JSONL log."""
+    save_devices(filepath, devices)
+    log.truncate(0)
+
+
+def persist(filepath: Path, log, rows: list, snapshot: dict = None):
+    """Append a scan's rows to the log, then checkpoint if given a snapshot."""
+    append_devices(log, rows)
+    if snapshot is not None:
+        checkpoint(filepath, log, snapshot)
+
+
+def record_advertisement(all_devices: dict, seen: dict, device, advertisement_data):
+    """
+    Merge one advertisement into all_devices as soon as it arrives.
+    seen maps each address heard since the last save to True if it is new;
+    times_seen is bumped once per scan window, not once per advertisement.
+    """
+    address = device.address
+    name = device.name or advertisement_data.local_name or "Unknown"
+    rssi = advertisement_data.rssi
+    timestamp = datetime.now().isoformat()
+    
+    info = all_devices.get(address)
+    if info is None:
+        all_devices[address] = {
+            "name": name,
+            "address": address,
+            "rssi": rssi,
+            "last_seen": timestamp,
+            "first_seen": timestamp,
+            "times_seen": 1,
+        }
+        seen[address] = True
+        print(f"  ✨ NEW: {name} ({address}) RSSI: {rssi}")
+        return
+    
+    info["last_seen"] = timestamp
+    info["rssi"] = rssi
+    if address not in seen:
+        info["times_seen"] = info.get("times_seen", 1) + 1
+        seen[address] = False
+    if name != "Unknown" and info.get("name") == "Unknown":
+        info["name"] = name
 
 
 async def main():
     filepath = Path(OUTPUT_FILE)
     all_devices = load_existing_devices(filepath)
+    # Per-scan deltas are appended here; the full JSON is only rewritten on checkpoint
+    log = open(filepath.with_suffix(".jsonl"), "a", buffering=1 << 16)
     
     print("=" * 60)
     print("🔵 Bluetooth Scanner Started")
     print("=" * 60)
     print(f"Output file: {filepath.absolute()}")
-    print(f"Scan interval: {SCAN_INTERVAL} seconds")
+    print(f"Save interval: {SCAN_INTERVAL} seconds")
     print("Press Ctrl+C to stop scanning and save results.")
     print("=" * 60)
     print()
 
     scan_count = 0
+    seen = {}  # Addresses heard since the last save -> is new
+    save_task = None  # Disk write for the previous scan, overlapped with the next one
+    loop = asyncio.get_running_loop()
+    
+    # Scan continuously; advertisements are merged the moment they arrive
+    # instead of being batched into fixed discover() windows
+    scanner = BleakScanner(
+        detection_callback=lambda d, ad: record_advertisement(all_devices, seen, d, ad)
+    )
+    try:
+        await scanner.start()
+    except Exception as e:
+        print(f"  ⚠️  Scan error: {e}")
+        log.close()
+        return
     
     try:
         while True:
@@ -65,81 +154,85 @@ async def main():
             timestamp = datetime.now().isoformat()
             
             print(f"[{timestamp}] Scan #{scan_count} - Searching for devices...")
+            await asyncio.sleep(SCAN_INTERVAL)
+            
+            # Let the previous write finish first; both use the log
+            snapshot_due = scan_count % CHECKPOINT_EVERY == 0
+            if save_task is not None:
+                try:
+                    # Shielded so Ctrl+C here leaves the write running and
+                    # save_task set; the finally block waits for it
+                    await asyncio.shield(save_task)
+                except asyncio.CancelledError:
+                    raise  # Still an Exception on Python 3.7
+                except Exception as e:
+                    print(f"  ⚠️  Save error: {e}")
+                    snapshot_due = True  # Its rows missed the log; a snapshot covers them
+                save_task = None
             
             try:
-                devices = await scan_bluetooth()
+                # Take this window's changes; copy rows since they keep
+                # changing while the write runs in the background
+                changed = [dict(all_devices[a]) for a in seen]
+                new_count = sum(seen.values())
+                updated_count = len(seen) - new_count
+                seen.clear()
                 
-                new_count = 0
-                updated_count = 0
+                # Log this scan's changes (snapshot periodically) in a worker
+                # thread so the write doesn't hold up the event loop
+                snapshot = None
+                if snapshot_due:
+                    snapshot = {a: dict(info) for a, info in all_devices.items()}
+                save_task = loop.run_in_executor(None, persist, filepath, log, changed, snapshot)
                 
-                for device in devices:
-                    address = device.address
-                    name = device.name or "Unknown"
-                    rssi = device.rssi if hasattr(device, 'rssi') else None
-                    
-                    device_info = {
-                        "name": name,
-                        "address": address,
-                        "rssi": rssi,
-                        "last_seen": timestamp,
-                    }
-                    
-                    if address not in all_devices:
-                        device_info["first_seen"] = timestamp
-                        device_info["times_seen"] = 1
-                        all_devices[address] = device_info
-                        new_count += 1
-                        print(f"  ✨ NEW: {name} ({address}) RSSI: {rssi}")
-                    else:
-                        all_devices[address]["last_seen"] = timestamp
-                        all_devices[address]["rssi"] = rssi
-                        all_devices[address]["times_seen"] = all_devices[address].get("times_seen", 1) + 1
-                        if name != "Unknown" and all_devices[address].get("name") == "Unknown":
-                            all_devices[address]["name"] = name
-                        updated_count += 1
-                
-                # Save after each scan
-                save_devices(filepath, all_devices)
-                
-                print(f"  Found {len(devices)} devices this scan ({new_count} new, {updated_count} updated)")
+                print(f"  Found {len(changed)} devices this scan ({new_count} new, {updated_count} updated)")
                 print(f"  Total unique devices: {len(all_devices)}")
                 print()
                 
             except Exception as e:
-                print(f"  ⚠️  Scan error: {e}")
+                print(f"  ⚠️  Save error: {e}")
                 print()
             
-            # Wait before next scan
-            await asyncio.sleep(SCAN_INTERVAL)
-            
-    except KeyboardInterrupt:
-        print()
-        print("=" * 60)
-        print("🛑 Scanner stopped by user")
-        print("=" * 60)
-        
-        # Final save
-        save_devices(filepath, all_devices)
-        
-        print(f"\n📊 Final Summary:")
-        print(f"   Total scans performed: {scan_count}")
-        print(f"   Total unique devices found: {len(all_devices)}")
-        print(f"   Results saved to: {filepath.absolute()}")
-        print()
-        
-        # Print all discovered devices
-        if all_devices:
-            print("📋 All Discovered Devices:")
-            print("-" * 60)
-            for addr, info in sorted(all_devices.items(), key=lambda x: x[1].get("name", "").lower()):
-                name = info.get("name", "Unknown")
-                rssi = info.get("rssi", "N/A")
-                times = info.get("times_seen", 1)
-                print(f"   {name}")
-                print(f"      Address: {addr}")
-                print(f"      RSSI: {rssi} dBm | Seen {times} time(s)")
-                print()
-
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        # Under asyncio.run, Ctrl+C usually reaches us as a cancellation
+        pass
+    finally:
+        await scanner.stop()
+        # Final save (after any in-flight write so they don't interleave)
+        if save_task is not None:
+            try:
+                await save_task
+            except Exception as e:
+                print(f"  ⚠️  Save error: {e}")
+        checkpoint(filepath, log, all_devices)
+        log.close()
+    
+    print()
+    print("=" * 60)
+    print("🛑 Scanner stopped by user")
+    print("=" * 60)
+    
+    print(f"\n📊 Final Summary:")
+    print(f"   Total scans performed: {scan_count}")
+    print(f"   Total unique devices found: {len(all_devices)}")
+    print(f"   Results saved to: {filepath.absolute()}")
+    print()
+    
+    # Print all discovered devices
+    if all_devices:
+        print("📋 All Discovered Devices:")
+        print("-" * 60)
+        for addr, info in sorted(all_devices.items(), key=lambda x: x[1].get("name", "").lower()):
+            name = info.get("name", "Unknown")
+            rssi = info.get("rssi", "N/A")
+            times = info.get("times_seen", 1)
+            print(f"   {name}")
+            print(f"      Address: {addr}")
+            print(f"      RSSI: {rssi} dBm | Seen {times} time(s)")
+            print()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -4,6 +4,7 @@ Interactive BLE Broadcaster - Choose which device to broadcast to your Android p
 """
 
 import sys
+import time
 from pathlib import Path
 
 # Add venv packages
@@ -50,6 +51,16 @@ class BLEDelegate(NSObject):
             self.advertising = True
 
 
+def wait_for(flag, timeout, tick=0.01):
+    """Run the run loop in short ticks until flag() is true or timeout passes."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        NSRunLoop.currentRunLoop().runUntilDate_(NSDate.dateWithTimeIntervalSinceNow_(tick))
+        if flag():
+            return True
+    return False
+
+
 def show_menu():
     """Display device selection menu."""
     print()
@@ -91,12 +102,7 @@ def broadcast_device(pm, delegate, device_name):
     pm.startAdvertising_(ad_data)
     
     # Wait for advertising to start
-    for _ in range(20):
-        NSRunLoop.currentRunLoop().runUntilDate_(NSDate.dateWithTimeIntervalSinceNow_(0.1))
-        if delegate.advertising:
-            break
-    
-    if delegate.advertising:
+    if wait_for(lambda: delegate.advertising, timeout=2.0):
         print()
         print("=" * 55)
         print(f"✅ NOW BROADCASTING: {device_name}")
@@ -157,12 +163,7 @@ def main():
     pm = CBPeripheralManager.alloc().initWithDelegate_queue_(delegate, None)
     
     # Wait for Bluetooth to be ready
-    for _ in range(40):
-        NSRunLoop.currentRunLoop().runUntilDate_(NSDate.dateWithTimeIntervalSinceNow_(0.1))
-        if delegate.ready:
-            break
-    
-    if not delegate.ready:
+    if not wait_for(lambda: delegate.ready, timeout=4.0):
         print("❌ Bluetooth not available!")
         print("   Make sure Bluetooth is ON on your Mac")
         return
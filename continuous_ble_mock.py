@@ -4,32 +4,96 @@ Continuous BLE Mock Broadcaster for Android Emulator.
 Simulates real Bluetooth devices continuously advertising.
 """
 
+import argparse
 import json
+import operator
+import queue
 import subprocess
+import threading
 import random
 import time
 import sys
 from pathlib import Path
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Fall back to stdlib json
+
 # Configuration
 INPUT_FILE = "bluetooth_devices.json"
 # Use /data/local/tmp which is accessible without storage permissions
 ANDROID_PATH = "/data/local/tmp/mock_bluetooth_devices.json"
 ADB_PATH = Path.home() / "Library/Android/sdk/platform-tools/adb"
+HEREDOC_EOF = "__MOCK_BLE_EOF__"  # Terminates each payload streamed into the adb shell
+PUSH_ACK = b"__MOCK_BLE_ACK__"  # Shell echoes this plus the push's exit status
+
+# Shell script framing around each pushed payload (built once, not per cycle).
+# Writes to .tmp and renames so the app never reads a half-written file, then
+# notifies the app; the intent is optional, so its output is discarded.
+# Finally acknowledges the push so we know whether (and when) it landed.
+PUSH_SCRIPT_HEAD = f"cat > {ANDROID_PATH}.tmp <<'{HEREDOC_EOF}'\n".encode()
+PUSH_SCRIPT_TAIL = (
+    f"\n{HEREDOC_EOF}\n"
+    f"s=$?; [ $s -eq 0 ] && mv {ANDROID_PATH}.tmp {ANDROID_PATH}; s=$?\n"
+    f"[ $s -eq 0 ] && am broadcast -a com.mock.ble.SCAN_RESULT --ei device_count %d >/dev/null 2>&1\n"
+    f"echo {PUSH_ACK.decode()}$s\n"
+).encode()
 
 # Simulation settings
 UPDATE_INTERVAL = 2.0  # seconds between updates
+MIN_INTERVAL = 0.2  # shortest sleep between updates
+MAX_INTERVAL = 10.0  # longest interval when backing off from a slow/failed push
+PUSH_TIMEOUT = 5.0  # seconds to wait for the device to acknowledge a push
+SLOW_CYCLE = 0.5  # seconds; shorter cycles never count as slow, whatever the jitter
 MIN_VISIBLE_DEVICES = 10  # minimum devices visible at once
 RSSI_RANGE = (-50, -25)  # STRONG signal range (dBm) - close proximity
 RSSI_FLUCTUATION = 5  # small RSSI change between updates (stable signal)
+RSSI_STEPS = range(-RSSI_FLUCTUATION, RSSI_FLUCTUATION + 1)
+CONNECTABLE_POOL = (True,) * 7 + (False,) * 3  # 70% connectable
+
+
+def to_json_bytes(data) -> bytes:
+    """Serialize to compact JSON bytes (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def order_devices(devices: dict):
+    """
+    Order devices named-first, strongest signal first within each group.
+    Returns (device_list, named_count, best), where best is the device with
+    the strongest signal overall, all from a single pass over devices.
+    """
+    by_rssi = operator.itemgetter("rssi")
+    named, unknown = [], []
+    for d in devices.values():
+        (unknown if d["name"] == "Unknown" else named).append(d)
+    named.sort(key=by_rssi, reverse=True)
+    unknown.sort(key=by_rssi, reverse=True)
+    
+    # The strongest device heads one of the two groups
+    best = max(named[:1] + unknown[:1], key=by_rssi)
+    return named + unknown, len(named), best
 
 
 class BLEMockBroadcaster:
-    def __init__(self):
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
         self.all_devices = {}
         self.visible_devices = {}
         self.device_rssi = {}  # track RSSI per device
+        self.named_addrs = []  # partitions of all_devices, fixed after load
+        self.unknown_addrs = []
+        self.base_rows = {}  # per-device fields that don't change between cycles
+        self.adb_proc = None  # long-lived `adb shell` fed through stdin
+        self.shell_output = None  # lines the shell prints, read by a thread
+        self.push_pending = False  # a push was sent and its ack not yet read
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = UPDATE_INTERVAL  # current target cycle period
+        self.cycle_ewma = None  # smoothed time spent working per cycle
         
     def load_devices(self):
         """Load all scanned devices from JSON file."""
@@ -39,20 +103,33 @@ class BLEMockBroadcaster:
             print("   Run bluetooth_scanner.py first.")
             sys.exit(1)
             
-        with open(input_path, "r") as f:
+        with open(input_path, "rb") as f:
             self.all_devices = json.load(f)
         
         # Initialize RSSI for all devices
         for addr in self.all_devices:
             self.device_rssi[addr] = random.randint(*RSSI_RANGE)
+        
+        # Precompute everything simulate_scan_cycle needs that never changes
+        loaded_at = datetime.now().isoformat()
+        self.named_addrs = [a for a, d in self.all_devices.items() if d.get("name") != "Unknown"]
+        self.unknown_addrs = [a for a, d in self.all_devices.items() if d.get("name") == "Unknown"]
+        self.base_rows = {
+            addr: {
+                "address": addr,
+                "name": d.get("name", "Unknown"),
+                "firstSeen": d.get("first_seen", loaded_at),
+                "timesSeen": d.get("times_seen", 1),
+            }
+            for addr, d in self.all_devices.items()
+        }
             
         print(f"📂 Loaded {len(self.all_devices)} devices from {INPUT_FILE}")
         
         # Get named devices for display
-        named = [d for d in self.all_devices.values() if d.get("name") != "Unknown"]
-        print(f"   Named devices: {len(named)}")
-        for d in named:
-            print(f"   • {d['name']}")
+        print(f"   Named devices: {len(self.named_addrs)}")
+        for addr in self.named_addrs:
+            print(f"   • {self.all_devices[addr]['name']}")
     
     def check_adb(self):
         """Verify ADB connection."""
@@ -75,6 +152,68 @@ class BLEMockBroadcaster:
             print(f"❌ ADB not found at {ADB_PATH}")
             return False
     
+    def open_shell(self):
+        """Start the persistent adb shell that receives each cycle's data."""
+        self.adb_proc = subprocess.Popen(
+            [str(ADB_PATH), "shell", "sh"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        )
+        self.shell_output = queue.Queue()
+        threading.Thread(
+            target=self.read_shell_output,
+            args=(self.adb_proc.stdout, self.shell_output),
+            daemon=True
+        ).start()
+    
+    @staticmethod
+    def read_shell_output(stream, lines):
+        """Forward the shell's output to a queue line by line; None marks EOF."""
+        for line in stream:
+            lines.put(line)
+        lines.put(None)
+    
+    def close_shell(self, kill=False):
+        """Shut down the persistent adb shell (straight away if kill)."""
+        if self.adb_proc is None:
+            return
+        proc, self.adb_proc = self.adb_proc, None
+        self.push_pending = False
+        if not kill:
+            try:
+                proc.stdin.write(b"exit\n")
+                proc.stdin.close()
+                proc.wait(timeout=5)
+                return
+            except (OSError, subprocess.TimeoutExpired):
+                pass  # Shell already gone or not responding
+        proc.kill()
+        proc.wait()
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass  # Unsent data has nowhere to go
+    
+    def wait_for_ack(self):
+        """
+        Wait for the shell to acknowledge the last push.
+        Returns (ok, error message); gives up after PUSH_TIMEOUT seconds.
+        """
+        output = []
+        deadline = time.monotonic() + PUSH_TIMEOUT
+        while True:
+            try:
+                line = self.shell_output.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                return False, f"no response from device after {PUSH_TIMEOUT:g}s"
+            if line is None:
+                error = b"".join(output).decode(errors="replace").strip()
+                return False, error or "adb shell exited"
+            if line.startswith(PUSH_ACK):
+                status = line[len(PUSH_ACK):].strip().decode()
+                error = b"".join(output).decode(errors="replace").strip()
+                return status == "0", error or f"exit status {status}"
+            output.append(line)
+    
     def simulate_scan_cycle(self):
         """
         Simulate a BLE scan cycle:
@@ -82,87 +221,106 @@ class BLEMockBroadcaster:
         - RSSI values fluctuate
         - Named devices have higher visibility
         """
-        all_addrs = list(self.all_devices.keys())
-        
         # Determine how many devices are visible this cycle
         # Named devices are more likely to be visible
-        named_addrs = [a for a, d in self.all_devices.items() if d.get("name") != "Unknown"]
-        unknown_addrs = [a for a in all_addrs if a not in named_addrs]
-        
         # Always include ALL named devices (100% visible)
-        visible = named_addrs.copy()
+        visible = self.named_addrs.copy()
         
         # Add random unknown devices
         num_unknown = random.randint(
             max(0, MIN_VISIBLE_DEVICES - len(visible)),
-            min(len(unknown_addrs), 15)
+            min(len(self.unknown_addrs), 15)
         )
-        visible.extend(random.sample(unknown_addrs, num_unknown))
+        visible.extend(random.sample(self.unknown_addrs, num_unknown))
         
         # Update visible devices with current timestamp and fluctuating RSSI
         self.visible_devices = {}
         now = datetime.now().isoformat()
         
-        for addr in visible:
-            device = self.all_devices[addr].copy()
-            
-            # Fluctuate RSSI (simulate movement/interference)
-            current_rssi = self.device_rssi[addr]
-            change = random.randint(-RSSI_FLUCTUATION, RSSI_FLUCTUATION)
-            new_rssi = max(RSSI_RANGE[0], min(RSSI_RANGE[1], current_rssi + change))
+        # Fluctuate RSSI (simulate movement/interference) and pick which
+        # devices are connectable, drawing each for every device in one call
+        lo, hi = RSSI_RANGE
+        changes = random.choices(RSSI_STEPS, k=len(visible))
+        connectable = random.choices(CONNECTABLE_POOL, k=len(visible))
+        
+        for addr, change, is_connectable in zip(visible, changes, connectable):
+            new_rssi = max(lo, min(hi, self.device_rssi[addr] + change))
             self.device_rssi[addr] = new_rssi
             
             self.visible_devices[addr] = {
-                "address": addr,
-                "name": device.get("name", "Unknown"),
+                **self.base_rows[addr],
                 "rssi": new_rssi,
                 "lastSeen": now,
-                "firstSeen": device.get("first_seen", now),
-                "timesSeen": device.get("times_seen", 1),
-                "isConnectable": random.random() < 0.7  # 70% connectable
+                "isConnectable": is_connectable
             }
         
         return self.visible_devices
     
-    def push_to_emulator(self, devices: dict):
-        """Push current visible devices to emulator."""
-        # Convert to list format
-        device_list = sorted(
-            devices.values(),
-            key=lambda x: (x["name"] == "Unknown", -x["rssi"])  # Named first, then by signal
-        )
-        
-        # Write to temp file
-        temp_file = Path("/tmp/mock_ble_live.json")
-        with open(temp_file, "w") as f:
-            json.dump(device_list, f, indent=2)
+    def push_to_emulator(self, device_list: list):
+        """
+        Push current visible devices to emulator and broadcast an intent
+        to notify the app of new scan results, in a single shell round-trip.
+        Your Android app can register a BroadcastReceiver for the intent.
+        Doesn't wait for the device; finish_push collects the result.
+        """
+        # Stream compact JSON into the shell
+        payload = to_json_bytes(device_list)
         
-        # Push to emulator
+        # Push to emulator (restart the shell if adb went away)
+        if self.adb_proc is None or self.adb_proc.poll() is not None:
+            self.close_shell()
+            self.open_shell()
         try:
-            subprocess.run(
-                [str(ADB_PATH), "push", str(temp_file), ANDROID_PATH],
-                capture_output=True, check=True
-            )
+            # Write the pieces into the pipe's buffer rather than joining
+            # them first, so the payload isn't copied again
+            stdin = self.adb_proc.stdin
+            stdin.write(PUSH_SCRIPT_HEAD)
+            stdin.write(payload)
+            stdin.write(PUSH_SCRIPT_TAIL % len(device_list))
+            stdin.flush()
+        except BrokenPipeError:
+            pass  # Shell died; finish_push reports its last output
+        self.push_pending = True
+    
+    def finish_push(self) -> bool:
+        """Collect the last push's acknowledgement; returns whether it landed."""
+        if not self.push_pending:
             return True
-        except subprocess.CalledProcessError as e:
-            print(f"❌ Push failed: {e.stderr}")
+        self.push_pending = False
+        
+        ok, error = self.wait_for_ack()
+        if not ok:
+            print(f"❌ Push failed: {error}")
+            # Start from a fresh shell next cycle; this one may be stuck
+            # mid-script, so don't wait for it to exit
+            self.close_shell(kill=True)
             return False
+        
+        return True
     
-    def broadcast_intent(self, devices: dict):
+    def adapt_interval(self, pushed: bool, cycle_time: float) -> float:
         """
-        Broadcast an intent to notify the app of new scan results.
-        Your Android app can register a BroadcastReceiver for this.
+        Work out how long to sleep after a cycle that took cycle_time seconds
+        (including any wait for the previous push to be acknowledged).
+        Keeps the period at UPDATE_INTERVAL by subtracting the smoothed work
+        time; a failed push or a cycle over twice the usual time doubles the
+        period, which then halves back once pushes keep up again.
         """
-        try:
-            # Send broadcast intent with device count
-            subprocess.run(
-                [str(ADB_PATH), "shell", "am", "broadcast",
-                 "-a", "com.mock.ble.SCAN_RESULT",
-                 "--ei", "device_count", str(len(devices))],
-                capture_output=True, check=True
-            )
-        except subprocess.CalledProcessError:
-            pass  # Intent broadcast is optional
+        slow = (self.cycle_ewma is not None
+                and cycle_time > 2 * self.cycle_ewma
+                and cycle_time > SLOW_CYCLE)
+        if not pushed or slow:
+            self.interval = min(self.max_interval, self.interval * 2)
+        else:
+            self.interval = max(UPDATE_INTERVAL, self.interval / 2)
+        
+        if self.cycle_ewma is None:
+            self.cycle_ewma = cycle_time
+        else:
+            self.cycle_ewma = 0.9 * self.cycle_ewma + 0.1 * cycle_time
+        
+        sleep = min(self.interval, self.max_interval) - self.cycle_ewma
+        return max(self.min_interval, sleep)
     
     def run(self):
         """Main broadcast loop."""
@@ -175,6 +333,8 @@ class BLEMockBroadcaster:
         if not self.check_adb():
             sys.exit(1)
         
+        self.open_shell()
+        
         print(f"\n🔄 Broadcasting every {UPDATE_INTERVAL}s (Ctrl+C to stop)")
         print("-" * 60)
         
@@ -182,38 +342,48 @@ class BLEMockBroadcaster:
         try:
             while True:
                 cycle += 1
+                started = time.monotonic()
                 
                 # Simulate scan
                 visible = self.simulate_scan_cycle()
                 
-                # Push to emulator
-                if self.push_to_emulator(visible):
-                    # Count named devices
-                    named = [d for d in visible.values() if d["name"] != "Unknown"]
-                    
-                    # Get best signal device
-                    best = max(visible.values(), key=lambda x: x["rssi"])
-                    
-                    # Status line
-                    timestamp = datetime.now().strftime("%H:%M:%S")
-                    print(f"[{timestamp}] Cycle {cycle}: {len(visible)} devices "
-                          f"({len(named)} named) | "
-                          f"Best: {best['name'][:20]} ({best['rssi']} dBm)")
-                    
-                    # Broadcast intent to notify app
-                    self.broadcast_intent(visible)
+                # Named first, then by signal; also counts named devices and
+                # finds the best signal device
+                device_list, named_count, best = order_devices(visible)
+                
+                # The previous push has been landing during the sleep and this
+                # simulation; make sure it did before sending the next one
+                pushed = self.finish_push()
+                
+                # Push to emulator and notify app
+                self.push_to_emulator(device_list)
                 
-                time.sleep(UPDATE_INTERVAL)
+                # Status line
+                timestamp = datetime.now().strftime("%H:%M:%S")
+                print(f"[{timestamp}] Cycle {cycle}: {len(device_list)} devices "
+                      f"({named_count} named) | "
+                      f"Best: {best['name'][:20]} ({best['rssi']} dBm)")
+                
+                time.sleep(self.adapt_interval(pushed, time.monotonic() - started))
                 
         except KeyboardInterrupt:
             print("\n\n" + "=" * 60)
             print("🛑 Broadcast stopped")
             print(f"   Total cycles: {cycle}")
             print("=" * 60)
+        finally:
+            self.close_shell()
 
 
 def main():
-    broadcaster = BLEMockBroadcaster()
+    parser = argparse.ArgumentParser(description="Continuous BLE mock broadcaster for Android emulator.")
+    parser.add_argument("--min-interval", type=float, default=MIN_INTERVAL,
+                        help=f"shortest sleep between updates in seconds (default: {MIN_INTERVAL})")
+    parser.add_argument("--max-interval", type=float, default=MAX_INTERVAL,
+                        help=f"longest update interval when pushes are slow or failing (default: {MAX_INTERVAL})")
+    args = parser.parse_args()
+    
+    broadcaster = BLEMockBroadcaster(args.min_interval, args.max_interval)
     broadcaster.run()
 
 
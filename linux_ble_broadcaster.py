@@ -66,26 +66,28 @@ def set_device_name(name):
         return False
 
 
+def build_ad_args(name):
+    """Build the hcitool advertising data arguments for a device name."""
+    name_bytes = name.encode('utf-8')[:20]  # Max 20 bytes for name
+    
+    # Build advertising data
+    # Format: Length, Type, Data
+    # 0x02 0x01 0x06 = Flags (LE General Discoverable)
+    # name_len+1, 0x09, name = Complete Local Name
+    ad_bytes = bytes([0x02, 0x01, 0x06, len(name_bytes) + 1, 0x09]) + name_bytes
+    
+    # Pad to 31 bytes
+    return [f"{b:02x}" for b in ad_bytes.ljust(31, b'\x00')]
+
+
+# Advertising data for the known devices, built once at startup
+AD_ARGS = {name: build_ad_args(name) for name in DEVICES}
+
+
 def start_advertising_hcitool(name):
     """Start BLE advertising using hcitool (legacy method)."""
     try:
-        # Encode device name for advertising data
-        name_bytes = name.encode('utf-8')[:20]  # Max 20 bytes for name
-        name_hex = name_bytes.hex()
-        name_len = len(name_bytes)
-        
-        # Build advertising data
-        # Format: Length, Type, Data
-        # 0x02 0x01 0x06 = Flags (LE General Discoverable)
-        # name_len+1, 0x09, name = Complete Local Name
-        flags = "02 01 06"
-        name_ad = f"{name_len + 1:02x} 09 {name_hex}"
-        
-        # Pad to 31 bytes
-        ad_data = f"{flags} {name_ad}"
-        ad_bytes = bytes.fromhex(ad_data.replace(" ", ""))
-        padded = ad_bytes.ljust(31, b'\x00')
-        ad_hex = " ".join(f"{b:02x}" for b in padded)
+        ad_args = AD_ARGS.get(name) or build_ad_args(name)
         
         # Stop any existing advertising
         subprocess.run(
@@ -95,7 +97,7 @@ def start_advertising_hcitool(name):
         
         # Set advertising data
         subprocess.run(
-            ["hcitool", "-i", "hci0", "cmd", "0x08", "0x0008"] + ad_hex.split(),
+            ["hcitool", "-i", "hci0", "cmd", "0x08", "0x0008"] + ad_args,
             capture_output=True, timeout=5
         )
         
@@ -114,29 +116,23 @@ def start_advertising_hcitool(name):
 def start_advertising_btmgmt(name):
     """Start BLE advertising using btmgmt (modern method)."""
     try:
-        # Set the name
-        subprocess.run(
-            ["btmgmt", "name", name],
-            capture_output=True, timeout=5
-        )
-        
-        # Power on
-        subprocess.run(
-            ["btmgmt", "power", "on"],
-            capture_output=True, timeout=5
-        )
-        
-        # Make discoverable
-        subprocess.run(
-            ["btmgmt", "discov", "yes"],
-            capture_output=True, timeout=5
-        )
-        
-        # Enable advertising
-        subprocess.run(
-            ["btmgmt", "advertising", "on"],
-            capture_output=True, timeout=5
-        )
+        # Set the name, power on, make discoverable and enable advertising.
+        # One non-interactive call per command, so each one has completed
+        # (and reported its status) before the next is sent
+        for args in (
+            ["name", name],
+            ["power", "on"],
+            ["discov", "yes"],
+            ["advertising", "on"],
+        ):
+            result = subprocess.run(
+                ["btmgmt"] + args,
+                capture_output=True, text=True, timeout=5
+            )
+            if result.returncode != 0:
+                output = (result.stderr or result.stdout).strip()
+                print(f"btmgmt {args[0]} failed: {output}")
+                return False
         
         return True
     except FileNotFoundError:
@@ -2,22 +2,56 @@
 """
 Push Bluetooth scan results to Android Emulator.
 Your Android app should read from this file to get mock Bluetooth devices.
+
+The input is either bluetooth_scanner.py output (a JSON object keyed by
+address), which is converted, or a file already in the Android format (a
+JSON list of device objects, as this script writes), which is checked to be
+valid JSON and then pushed as-is without conversion.
+
+Usage:
+  python3 push_to_emulator.py [input.json]
 """
 
+import argparse
 import json
+import re
+import shlex
+import shutil
 import subprocess
 import sys
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Fall back to stdlib json
+
 INPUT_FILE = "bluetooth_devices.json"
 # Location on Android device/emulator where the file will be pushed
 ANDROID_PATH = "/sdcard/Download/mock_bluetooth_devices.json"
+# Matches "<serial>\tdevice" lines of `adb devices` (skips offline/unauthorized)
+ADB_DEVICE_RE = re.compile(rb"^(\S+)\s+device\r?$", re.M)
+
 
+def load_devices(filepath: Path):
+    """
+    Load scanned devices (or an Android-format list) from JSON file.
+    Returns (raw bytes, parsed data), so the file can be pushed unchanged.
+    """
+    with open(filepath, "rb") as f:
+        raw = f.read()
+    if orjson is not None:
+        return raw, orjson.loads(raw)
+    return raw, json.loads(raw)
 
-def load_devices(filepath: Path) -> dict:
-    """Load scanned devices from JSON file."""
-    with open(filepath, "r") as f:
-        return json.load(f)
+
+def to_json_bytes(data, indent: bool = False) -> bytes:
+    """Serialize to JSON bytes (orjson when installed), compact unless indent."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(data, indent=2).encode()
+    return json.dumps(data, separators=(",", ":")).encode()
 
 
 def convert_to_android_format(devices: dict) -> list:
@@ -25,16 +59,17 @@ def convert_to_android_format(devices: dict) -> list:
     Convert to a simpler format for Android consumption.
     Returns a list of device objects.
     """
-    android_devices = []
-    for address, info in devices.items():
-        android_devices.append({
+    android_devices = [
+        {
             "address": address,
             "name": info.get("name", "Unknown"),
             "rssi": info.get("rssi"),
             "firstSeen": info.get("first_seen"),
             "lastSeen": info.get("last_seen"),
             "timesSeen": info.get("times_seen", 1)
-        })
+        }
+        for address, info in devices.items()
+    ]
     
     # Sort by name (Unknown devices last)
     android_devices.sort(key=lambda x: (x["name"] == "Unknown", x["name"].lower()))
@@ -43,97 +78,124 @@ def convert_to_android_format(devices: dict) -> list:
 
 def check_adb():
     """Check if ADB is available and an emulator is running."""
-    try:
-        result = subprocess.run(
-            ["adb", "devices"],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        lines = result.stdout.strip().split('\n')
-        devices = [l for l in lines[1:] if l.strip() and 'device' in l]
-        
-        if not devices:
-            print("❌ No Android devices/emulators found!")
-            print("   Make sure your emulator is running.")
-            return False
-        
-        print(f"✅ Found {len(devices)} Android device(s):")
-        for d in devices:
-            print(f"   - {d.split()[0]}")
-        return True
-        
-    except FileNotFoundError:
+    # PATH lookup first, so a missing adb costs no fork/exec
+    if shutil.which("adb") is None:
         print("❌ ADB not found!")
         print("   Make sure Android SDK platform-tools is in your PATH.")
         print("   Typically: ~/Library/Android/sdk/platform-tools")
         return False
+    
+    result = subprocess.run(
+        ["adb", "devices"],
+        capture_output=True,
+        check=True
+    )
+    serials = ADB_DEVICE_RE.findall(result.stdout)
+    
+    if not serials:
+        print("❌ No Android devices/emulators found!")
+        print("   Make sure your emulator is running.")
+        return False
+    
+    print(f"✅ Found {len(serials)} Android device(s):")
+    for serial in serials:
+        print(f"   - {serial.decode()}")
+    return True
 
 
-def push_to_device(data: list, android_path: str):
-    """Push the JSON data to the Android device."""
-    # Create temp file
-    temp_file = Path("/tmp/mock_bluetooth_devices.json")
-    with open(temp_file, "w") as f:
-        json.dump(data, f, indent=2)
-    
+def push_to_device(payload: bytes, android_path: str):
+    """Push serialized JSON to the Android device."""
     print(f"\n📤 Pushing to {android_path}...")
     
     try:
+        # Stream straight into the device over adb's stdin - no local temp
+        # file. Write beside the target and rename, so an interrupted push
+        # never leaves a truncated file for the app to read.
+        path = shlex.quote(android_path)
+        tmp_path = shlex.quote(android_path + ".tmp")
         result = subprocess.run(
-            ["adb", "push", str(temp_file), android_path],
-            capture_output=True,
-            text=True,
+            ["adb", "shell", f"cat > {tmp_path} && mv -f {tmp_path} {path}"],
+            input=payload,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             check=True
         )
         print(f"✅ Success! File pushed to emulator.")
         print(f"   Path: {android_path}")
         return True
     except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to push file: {e.stderr}")
+        print(f"❌ Failed to push file: {e.stderr.decode(errors='replace')}")
         return False
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Push Bluetooth scan results to Android Emulator.")
+    parser.add_argument("input", nargs="?", default=INPUT_FILE,
+                        help=f"scanner output or Android-format device list (default: {INPUT_FILE})")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("📱 Bluetooth Mock Data Pusher for Android Emulator")
     print("=" * 60)
     
     # Check input file
-    input_path = Path(INPUT_FILE)
+    input_path = Path(args.input)
     if not input_path.exists():
-        print(f"❌ Input file not found: {INPUT_FILE}")
+        print(f"❌ Input file not found: {args.input}")
         print("   Run bluetooth_scanner.py first to generate device data.")
         sys.exit(1)
     
-    # Load and convert devices
-    print(f"\n📂 Loading devices from {INPUT_FILE}...")
-    devices = load_devices(input_path)
-    print(f"   Found {len(devices)} unique devices")
-    
-    android_data = convert_to_android_format(devices)
-    
-    # Show preview
-    named_devices = [d for d in android_data if d["name"] != "Unknown"]
-    print(f"\n📋 Named devices ({len(named_devices)}):")
-    for d in named_devices:
-        print(f"   • {d['name']} ({d['address'][:8]}...)")
+    # Parse even a file that will be pushed as-is, so a corrupt one is
+    # caught here instead of by the app
+    print(f"\n📂 Loading devices from {args.input}...")
+    try:
+        raw, devices = load_devices(input_path)
+    except ValueError as e:
+        print(f"❌ {args.input} is not valid JSON: {e}")
+        sys.exit(1)
     
-    print(f"   + {len(android_data) - len(named_devices)} unknown devices")
+    if isinstance(devices, list) and all(isinstance(d, dict) for d in devices):
+        # Already what the app reads - skip the convert/dump
+        print(f"   Already in Android format ({len(devices)} devices), pushing as-is")
+        android_data = None
+    elif not isinstance(devices, dict):
+        print(f"❌ {args.input} is neither scanner output nor an Android-format device list")
+        sys.exit(1)
+    else:
+        print(f"   Found {len(devices)} unique devices")
+        
+        # Convert devices
+        android_data = convert_to_android_format(devices)
+        
+        # Show preview
+        named_devices = [d for d in android_data if d["name"] != "Unknown"]
+        print(f"\n📋 Named devices ({len(named_devices)}):")
+        if named_devices:
+            # One write for the whole list rather than a print per device
+            print("\n".join(f"   • {d['name']} ({d['address'][:8]}...)" for d in named_devices))
+        
+        print(f"   + {len(android_data) - len(named_devices)} unknown devices")
     
     # Check ADB
     print("\n🔍 Checking ADB connection...")
     if not check_adb():
-        # Still save the file locally for manual transfer
-        output_file = Path("mock_bluetooth_devices.json")
-        with open(output_file, "w") as f:
-            json.dump(android_data, f, indent=2)
-        print(f"\n💾 Saved locally to: {output_file.absolute()}")
+        if android_data is None:
+            print(f"\n💾 Already in Android format: {input_path.absolute()}")
+        else:
+            # Still save the file locally for manual transfer
+            output_file = Path("mock_bluetooth_devices.json")
+            # Indented, since this copy is meant to be opened by a person
+            output_file.write_bytes(to_json_bytes(android_data, indent=True))
+            print(f"\n💾 Saved locally to: {output_file.absolute()}")
         print("   You can manually copy this file to your emulator/device.")
         sys.exit(1)
     
-    # Push to device
-    push_to_device(android_data, ANDROID_PATH)
+    # Push to device (compact on the wire - the app parses it either way)
+    if android_data is None:
+        payload = raw
+    else:
+        payload = to_json_bytes(android_data)
+    push_to_device(payload, ANDROID_PATH)
     
     print("\n" + "=" * 60)
     print("📝 In your Android app, read from:")